@@ -1,14 +1,37 @@
 # main.py (이미지 벡터 검색 최종 버전)
 
-import os, re, io, base64
+import os, io, base64, asyncio, hashlib, tempfile, threading, zipfile
+
+# ✨ NumPy를 import하기 전에 BLAS 스레드를 1개로 고정합니다. 작은 행렬-벡터 곱에서는 스레드 실행 비용이
+#    계산보다 크고, 여러 워커가 각자 nproc개씩 띄우면 CPU를 과하게 나눠 쓰게 됩니다. (환경 변수로 덮어쓰기 가능)
+os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
 from pathlib import Path
+from collections import OrderedDict
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Body, HTTPException
+from fastapi import FastAPI, Body, File, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 import numpy as np
 import google.generativeai as genai
 
+try:
+    import simsimd # AVX2/AVX-512/NEON 커널로 코사인 유사도 계산
+except ImportError:
+    simsimd = None
+
+try:
+    import faiss # 참조 이미지가 많을 때 사용하는 벡터 인덱스 (pip install faiss-cpu)
+except ImportError:
+    faiss = None
+
+try:
+    import numba # SimSIMD를 쓸 수 없는 환경에서 유사도 계산 커널을 JIT 컴파일
+except ImportError:
+    numba = None
+
 # --- 1. 설정 ---
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 GOOGLE_CREDENTIALS_PATH = "/etc/secrets/google-credentials.json"
@@ -16,10 +39,29 @@ GOOGLE_CREDENTIALS_PATH = "/etc/secrets/google-credentials.json"
 # ✨ 1. 임베딩(지문 추출)과 응답 생성 모두 동일한 최신 모델을 사용합니다.
 MODEL_NAME = "gemini-1.5-flash"
 
+# ✨ int8 양자화 벡터로 비교할지 여부 (SimSIMD 필요). 0.7 기준값에서 정확도를 검증한 뒤 켜세요.
+USE_INT8_VECTORS = os.environ.get("USE_INT8_VECTORS") == "1"
+
+# ✨ 참조 이미지 임베딩을 디스크에 저장해, 재시작 시 Gemini 호출 없이 바로 불러옵니다.
+EMBEDDING_CACHE_PATH = Path(__file__).resolve().parent / "embedding_cache.npz"
+EMBED_IMAGE_SIZE = 512 # 임베딩 전에 이미지를 이 크기(정사각형 안)로 축소
+EMBED_BATCH_SIZE = 16 # 참조 이미지 임베딩 API 호출 1회당 이미지 수
+
+# ✨ 최근 쿼리 캐시: 거의 같은 프레임이 다시 들어오면 이전 응답을 그대로 돌려줍니다.
+QUERY_CACHE_SIZE = 64
+QUERY_CACHE_THRESHOLD = 0.95
+
+# ✨ 참조 벡터가 이 개수 이상이면 (faiss가 설치된 경우) FAISS 내적 인덱스로 검색합니다.
+FAISS_MIN_REFERENCES = int(os.environ.get("FAISS_MIN_REFERENCES", "1000"))
+
 # --- 2. 전역 변수 ---
 app: FastAPI
 MODEL: genai.GenerativeModel = None # 모델 객체
 REFERENCE_VECTORS = [] # { 'id': 'a_sculpture', 'vector': [0.1, 0.2, ...] }
+REF_MATRIX: np.ndarray = None # [N, D] float32, 각 행은 L2 정규화된 참조 벡터
+REF_MATRIX_I8: np.ndarray = None # REF_MATRIX를 int8로 양자화한 행렬
+REF_IDS = [] # REF_MATRIX의 각 행에 대응하는 객체 id
+REF_INDEX = None # REF_MATRIX를 담은 faiss.IndexFlatIP (참조가 적으면 None)
 OBJECT_TO_PLANET_MAP = {
     "stamp_1": "earth",   
     "stamp_2": "mars",    
@@ -27,12 +69,82 @@ OBJECT_TO_PLANET_MAP = {
     "stamp_4": "saturn",    
     "stamp_5": "neptune",
 }
+# ✨ 응답 딕셔너리는 요청마다 만들지 않고 시작할 때 한 번만 만들어 둡니다.
+MATCH_RESPONSES = {
+    object_name: {"status": "success", "planet_id": planet_id}
+    for object_name, planet_id in OBJECT_TO_PLANET_MAP.items()
+}
+MATCH_RESPONSES[None] = {"status": "no_match", "description": "일치하는 전시물을 찾을 수 없습니다."}
+UNMAPPED_OBJECT_RESPONSE = {"status": "no_match", "description": "매칭 오류: 객체에 연결된 행성이 없습니다."}
+QUERY_CACHE = OrderedDict() # 이미지 바이트 다이제스트 -> (정규화된 쿼리 벡터, 응답), LRU 순서
+QUERY_CACHE_MATRIX: np.ndarray = None # QUERY_CACHE의 쿼리 벡터들을 쌓은 [K, D] 행렬
+QUERY_CACHE_KEYS = [] # QUERY_CACHE_MATRIX의 각 행에 대응하는 이미지 바이트 다이제스트
+QUERY_CACHE_LOCK = threading.Lock() # 인식 요청은 워커 스레드에서 동시에 실행되므로 캐시 접근을 직렬화
 INITIALIZATION_ERROR = None
 
 # --- 3. Lifespan - 이미지 지문(벡터) 생성 ---
+def load_reference_image(image_path):
+    """이미지를 한 번만 디코딩해 RGB로 돌려주고, 파일 핸들은 바로 닫습니다."""
+    with Image.open(image_path) as im:
+        # JPEG은 draft 모드로 축소 디코딩되어 전체 해상도 디코딩을 건너뜁니다.
+        im.thumbnail((EMBED_IMAGE_SIZE, EMBED_IMAGE_SIZE), Image.Resampling.BILINEAR)
+        im.load()
+        return im.convert("RGB")
+
+async def embed_content(content):
+    # AI에게 이미지(또는 이미지 목록)를 보내 '이미지 벡터'를 요청합니다. (동기 API라 별도 스레드에서 실행)
+    response = await asyncio.to_thread(
+        MODEL.embed_content,
+        content=content,
+        task_type="RETRIEVAL_DOCUMENT" # "이것은 DB용 문서입니다"
+    )
+    return response['embedding']
+
+async def embed_batch(batch):
+    """(item_name, image_path) 묶음을 API 호출 한 번으로 임베딩해 벡터 리스트를 반환합니다."""
+    for item_name, image_path in batch:
+        print(f"  - {item_name} / {image_path.name} 지문 추출 중...")
+    images = [load_reference_image(image_path) for _, image_path in batch]
+    try:
+        embeddings = await embed_content(images)
+        if np.ndim(embeddings) != 2 or len(embeddings) != len(images):
+            raise ValueError("배치 임베딩 응답의 형식이 예상과 다릅니다.")
+    except Exception as e:
+        # SDK 버전에 따라 배치 요청이 안 되면 한 장씩 (동시에) 요청합니다.
+        print(f"⚠️ 배치 임베딩 실패, 한 장씩 요청합니다: {e}")
+        embeddings = await asyncio.gather(*(embed_content(img) for img in images))
+    return embeddings
+
+def load_embedding_cache(path):
+    """'{MODEL_NAME}:{EMBED_IMAGE_SIZE}:{sha256}' 키 -> 벡터 딕셔너리를 읽어옵니다. 파일이 없으면 빈 딕셔너리."""
+    if not path.exists():
+        return {}
+    try:
+        with np.load(path) as data:
+            return dict(zip(data["keys"].tolist(), data["vectors"]))
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        # 깨진 캐시 파일 때문에 앱이 죽지 않도록, 캐시 없이 다시 임베딩합니다.
+        print(f"⚠️ 임베딩 캐시를 읽을 수 없어 무시합니다: {e}")
+        return {}
+
+def save_embedding_cache(path, cache):
+    # 여러 워커가 동시에 저장해도 파일이 깨지지 않도록, 같은 폴더의 임시 파일에 쓴 뒤 os.replace로 바꿔 끼웁니다.
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.stem}-", suffix=".npz", delete=False) as f:
+            tmp_path = f.name
+            np.savez(f, keys=np.array(list(cache.keys())), vectors=np.asarray(list(cache.values()), dtype=np.float32))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        # 캐시는 있으면 좋은 것일 뿐이라, 저장에 실패해도(읽기 전용 파일시스템 등) 캐시 없이 계속 진행합니다.
+        print(f"⚠️ 임베딩 캐시 저장 실패: {e}")
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global MODEL, REFERENCE_VECTORS, INITIALIZATION_ERROR
+    global MODEL, REFERENCE_VECTORS, REF_MATRIX, REF_MATRIX_I8, REF_IDS, REF_INDEX, INITIALIZATION_ERROR
     print("✨ AI 비전 서버 리소스 초기화를 시작합니다...")
     try:
         os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GOOGLE_CREDENTIALS_PATH
@@ -44,21 +156,54 @@ async def lifespan(app: FastAPI):
         reference_dir = Path(__file__).resolve().parent / "reference_image"
         print("🤖 참조 이미지들의 임베딩 벡터를 생성합니다...")
         
-        for item_dir in reference_dir.iterdir():
-            if item_dir.is_dir():
-                item_name = item_dir.name
-                for image_path in item_dir.glob("*.jpg"): # .png, .jpg 등 확장자 지원
-                    print(f"  - {item_name} / {image_path.name} 지문 추출 중...")
-                    img = Image.open(image_path)
-                    # ✨ 3. AI에게 이미지 1장을 보내 '이미지 벡터'를 요청합니다.
-                    response = MODEL.embed_content(
-                        content=img, 
-                        task_type="RETRIEVAL_DOCUMENT" # "이것은 DB용 문서입니다"
-                    )
-                    REFERENCE_VECTORS.append({
-                        "id": item_name,
-                        "vector": response['embedding']
-                    })
+        # 폴더 이름이 곧 객체 id입니다. (reference_image/<id>/*.jpg)
+        all_paths = [(image_path.parent.name, image_path) for image_path in reference_dir.glob("*/*.jpg")]
+
+        # ✨ 3. (모델 이름, 이미지 해시)로 캐시를 조회해, 새로 추가/변경된 이미지만 임베딩합니다.
+        #    모델 이름과 축소 크기가 키에 포함되어 있어 둘 중 하나를 바꾸면 캐시가 자동으로 무효화됩니다.
+        cache = load_embedding_cache(EMBEDDING_CACHE_PATH)
+        keys = [f"{MODEL_NAME}:{EMBED_IMAGE_SIZE}:{hashlib.sha256(image_path.read_bytes()).hexdigest()}" for _, image_path in all_paths]
+        misses = [(key, item_name, image_path) for key, (item_name, image_path) in zip(keys, all_paths) if key not in cache]
+        print(f"💾 캐시 적중 {len(all_paths) - len(misses)}개, 새로 추출할 이미지 {len(misses)}개")
+
+        if misses:
+            # 남은 이미지는 EMBED_BATCH_SIZE장씩 묶어 요청하고, 묶음들은 동시에 보내 왕복 횟수를 줄입니다.
+            batches = [misses[i:i + EMBED_BATCH_SIZE] for i in range(0, len(misses), EMBED_BATCH_SIZE)]
+            tasks = [embed_batch([(item_name, image_path) for _, item_name, image_path in batch]) for batch in batches]
+            results = await asyncio.gather(*tasks)
+            vectors = [vector for embeddings in results for vector in embeddings]
+            for (key, _, _), vector in zip(misses, vectors):
+                cache[key] = np.asarray(vector, dtype=np.float32)
+
+        # 현재 참조 이미지의 키만 남깁니다. 교체된 이미지나 이전 모델(차원이 다를 수 있음)의 벡터가
+        # 파일에 계속 쌓이거나 서로 다른 길이의 벡터가 한 배열로 저장되는 일을 막습니다.
+        stale = len(cache) > len(set(keys))
+        cache = {key: cache[key] for key in keys}
+        if misses or stale:
+            save_embedding_cache(EMBEDDING_CACHE_PATH, cache)
+
+        REFERENCE_VECTORS = [{"id": item_name, "vector": cache[key]} for key, (item_name, _) in zip(keys, all_paths)]
+
+        # ✨ 참조 벡터들을 정규화된 float32 행렬 하나로 묶어 두고, 요청마다 행렬-벡터 곱 한 번으로 비교합니다.
+        if REFERENCE_VECTORS:
+            vecs = np.asarray([item["vector"] for item in REFERENCE_VECTORS], dtype=np.float32)
+            norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+            # 노름이 0인 벡터는 0 그대로 두어 행렬에 NaN이 생기지 않게 합니다.
+            np.divide(vecs, norms, out=vecs, where=norms > 0)
+        else:
+            print("⚠️ 참조 이미지가 없습니다. 모든 요청에 no_match로 응답합니다.")
+            vecs = np.empty((0, 0), dtype=np.float32)
+        # BLAS/SimSIMD가 요청마다 몰래 복사하지 않도록 C 연속 float32 배열로 고정합니다.
+        REF_MATRIX = np.ascontiguousarray(vecs, dtype=np.float32)
+        REF_MATRIX_I8 = quantize_int8(vecs)
+        REF_IDS = [item["id"] for item in REFERENCE_VECTORS]
+        if faiss is not None and REF_IDS and len(REF_IDS) >= FAISS_MIN_REFERENCES:
+            # 정규화된 벡터의 내적 = 코사인 유사도. 나중에 IndexHNSWFlat으로 바꿔도 호출부는 그대로입니다.
+            REF_INDEX = faiss.IndexFlatIP(REF_MATRIX.shape[1])
+            REF_INDEX.add(REF_MATRIX)
+        elif simsimd is None and batch_dot is not None and REF_IDS:
+            # 첫 요청이 JIT 컴파일 시간을 떠안지 않도록 시작할 때 미리 컴파일합니다.
+            batch_dot(REF_MATRIX, REF_MATRIX[0])
         print(f"✅ {len(REFERENCE_VECTORS)}개의 참조 벡터를 메모리에 로드했습니다.")
     except Exception as e:
         INITIALIZATION_ERROR = f"[{type(e).__name__}] {e}"
@@ -69,36 +214,121 @@ app = FastAPI(lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
 # --- 4. 벡터 유사도 계산 함수 ---
-def find_best_match(query_vector):
-    best_match_id = None
-    best_score = -1
-    
-    query_vec = np.array(query_vector)
-    
-    for item in REFERENCE_VECTORS:
-        item_vec = np.array(item["vector"])
-        # 코사인 유사도 계산
-        similarity = np.dot(query_vec, item_vec) / (np.linalg.norm(query_vec) * np.linalg.norm(item_vec))
-        
-        if similarity > best_score:
-            best_score = similarity
-            best_match_id = item["id"]
-            
+def quantize_int8(x):
+    """정규화된 float 벡터(행렬)를 [-128, 127] 범위의 int8로 양자화합니다."""
+    # astype은 0 쪽으로 잘라내므로, ±2~5 정도인 작은 성분이 0으로 쏠리지 않게 반올림한 뒤 변환합니다.
+    return np.rint(np.clip(x * 127, -128, 127)).astype(np.int8)
+
+if numba is not None:
+    # 참조 수십 개짜리 GEMV는 스레드를 띄우는 비용이 계산보다 커서 단일 스레드로 컴파일합니다.
+    # (parallel=True는 워커마다 nproc개 스레드를 띄워 BLAS 스레드 고정의 효과를 없앱니다.)
+    @numba.njit(fastmath=True)
+    def batch_dot(R, q):
+        """R의 각 행과 q의 내적. 행마다 한 번의 순회로 계산하고, 안쪽 루프는 LLVM이 AVX2 FMA로 벡터화합니다."""
+        scores = np.empty(R.shape[0], dtype=np.float32)
+        for i in range(R.shape[0]):
+            acc = np.float32(0.0)
+            for j in range(R.shape[1]):
+                acc += R[i, j] * q[j]
+            scores[i] = acc
+        return scores
+else:
+    batch_dot = None
+
+def similarity_scores(q):
+    """정규화된 쿼리 벡터 q와 모든 참조 벡터 사이의 코사인 유사도([-1, 1])를 반환합니다."""
+    if USE_INT8_VECTORS and simsimd is not None:
+        # ✨ int8 벡터는 메모리 이동량이 float32의 1/4이고, VNNI int8 내적을 사용합니다.
+        q_i8 = quantize_int8(q).reshape(1, -1)
+        distances = simsimd.cdist(q_i8, REF_MATRIX_I8, metric="cosine", out_dtype="float32")
+        return 1.0 - np.asarray(distances).ravel()
+    # 모든 벡터는 float32로 다룹니다. (float64 대비 메모리 이동량 절반, SIMD 레인 수 두 배)
+    # 참조 행렬과 쿼리 모두 L2 정규화되어 있으므로 코사인 유사도 = 내적입니다. (노름 계산 불필요)
+    if simsimd is not None:
+        # ✨ SimSIMD는 런타임에 CPU에 맞는 SIMD 커널을 골라 한 번에 계산합니다.
+        return np.asarray(simsimd.cdist(q.reshape(1, -1), REF_MATRIX, metric="dot", out_dtype="float32")).ravel()
+    if batch_dot is not None:
+        return batch_dot(REF_MATRIX, q)
+    return REF_MATRIX @ q
+
+def normalize_vector(vector):
+    q = np.ascontiguousarray(vector, dtype=np.float32)
+    # np.linalg.norm은 작은 벡터에서 호출 오버헤드가 커서 vdot으로 노름을 구합니다.
+    norm = np.sqrt(np.vdot(q, q))
+    # 영벡터는 그대로 두어 NaN이 생기지 않게 합니다. (모든 유사도가 0이 되어 일치 없음으로 처리)
+    return q / norm if norm > 0 else q
+
+def find_best_match(q):
+    """L2 정규화된 쿼리 벡터 q(normalize_vector 결과)에 가장 가까운 객체 id를 찾습니다."""
+    if not REF_IDS:
+        return None
+    if REF_INDEX is not None:
+        top_scores, top_ids = REF_INDEX.search(q.reshape(1, -1), 1)
+        i, best_score = int(top_ids[0, 0]), top_scores[0, 0]
+    else:
+        scores = similarity_scores(q)
+        i = int(scores.argmax())
+        best_score = scores[i]
+    best_match_id = REF_IDS[i]
+
     print(f"가장 유사한 객체: {best_match_id} (유사도: {best_score:.2f})")
     # ✨ 유사도 점수가 0.7 이상일 때만 일치로 인정 (이 값은 조절 가능)
     return best_match_id if best_score > 0.7 else None
 
-# --- 5. API 엔드포인트 ---
-@app.post("/api/recognize-stamp-object")
-async def recognize_stamp_object(payload: dict = Body(...)):
-    if INITIALIZATION_ERROR: raise HTTPException(status_code=500, detail=f"{INITIALIZATION_ERROR}")
+def match_response(matched_object_name):
+    # 미리 만들어 둔 응답 딕셔너리를 한 번의 조회로 꺼냅니다. (일치 없음 = None 키)
+    return MATCH_RESPONSES.get(matched_object_name, UNMAPPED_OBJECT_RESPONSE)
 
-    user_image_b64 = payload.get("image")
-    if not user_image_b64: raise HTTPException(status_code=400, detail="이미지 데이터가 없습니다.")
+# --- 4-1. 쿼리 캐시 ---
+def image_digest(image_bytes):
+    """업로드된 이미지 바이트의 정확한 다이제스트. 바이트가 완전히 같은 프레임만 같은 값이 됩니다."""
+    return hashlib.blake2b(image_bytes, digest_size=16).digest()
 
+def get_cached_response(image_hash):
+    with QUERY_CACHE_LOCK:
+        if image_hash not in QUERY_CACHE:
+            return None
+        QUERY_CACHE.move_to_end(image_hash)
+        return QUERY_CACHE[image_hash][1]
+
+def lookup_query_cache(q):
+    """캐시된 쿼리 중 q와 코사인 유사도가 기준값을 넘는 것이 있으면 그 응답을 반환합니다."""
+    with QUERY_CACHE_LOCK:
+        if not QUERY_CACHE_KEYS:
+            return None
+        sims = QUERY_CACHE_MATRIX @ q
+        j = int(sims.argmax())
+        # NaN이 섞여도 적중으로 처리되지 않도록 "초과하지 않으면"으로 비교합니다.
+        if not sims[j] > QUERY_CACHE_THRESHOLD:
+            return None
+        key = QUERY_CACHE_KEYS[j]
+        QUERY_CACHE.move_to_end(key)
+        return QUERY_CACHE[key][1]
+
+def store_query_cache(image_hash, q, result):
+    global QUERY_CACHE_MATRIX, QUERY_CACHE_KEYS
+    with QUERY_CACHE_LOCK:
+        QUERY_CACHE[image_hash] = (q, result)
+        QUERY_CACHE.move_to_end(image_hash)
+        while len(QUERY_CACHE) > QUERY_CACHE_SIZE:
+            QUERY_CACHE.popitem(last=False) # 가장 오래 쓰이지 않은 항목 제거
+        # 캐시에 넣는 건 미스(Gemini 호출)일 때뿐이라, 조회용 행렬은 이때만 다시 쌓습니다.
+        QUERY_CACHE_KEYS = list(QUERY_CACHE.keys())
+        QUERY_CACHE_MATRIX = np.stack([QUERY_CACHE[key][0] for key in QUERY_CACHE_KEYS])
+
+# --- 5. API 엔드포인트 ---
+def recognize_image_bytes(user_image_bytes):
     try:
-        user_image_bytes = base64.b64decode(user_image_b64.split(',')[1])
+        # ✨ 바이트가 똑같은 프레임이면 디코딩과 임베딩 호출 없이 이전 응답을 돌려줍니다.
+        #    (비슷한 프레임은 아래에서 쿼리 벡터의 코사인 유사도로 판단합니다.)
+        image_hash = image_digest(user_image_bytes)
+        cached = get_cached_response(image_hash)
+        if cached is not None:
+            return cached
+
         user_image = Image.open(io.BytesIO(user_image_bytes))
+        # ✨ 카메라 원본(수 MP)을 그대로 보내지 않고 축소해 디코딩/업로드 시간을 줄입니다.
+        user_image.thumbnail((EMBED_IMAGE_SIZE, EMBED_IMAGE_SIZE), Image.Resampling.BILINEAR)
 
         # ✨ 4. 사용자 이미지의 '이미지 벡터' 추출
         print("🤖 사용자 이미지의 벡터 추출 요청...")
@@ -106,20 +336,49 @@ async def recognize_stamp_object(payload: dict = Body(...)):
             content=user_image, 
             task_type="RETRIEVAL_QUERY" # "이것은 검색용 질문입니다"
         )
-        query_vector = response['embedding']
-        
+        q = normalize_vector(response['embedding'])
+
+        # 이전 쿼리와 충분히 비슷하면 참조 벡터 비교를 건너뜁니다.
+        cached = lookup_query_cache(q)
+        if cached is not None:
+            store_query_cache(image_hash, q, cached)
+            return cached
+
         # 5. 저장된 참조 벡터들과 고속 비교
-        matched_object_name = find_best_match(query_vector)
-        
-        if matched_object_name:
-            planet_id = OBJECT_TO_PLANET_MAP.get(matched_object_name)
-            if planet_id:
-                return {"status": "success", "planet_id": planet_id}
-            else:
-                return {"status": "no_match", "description": "매칭 오류: 객체에 연결된 행성이 없습니다."}
-        else:
-            return {"status": "no_match", "description": "일치하는 전시물을 찾을 수 없습니다."}
+        matched_object_name = find_best_match(q)
+        result = match_response(matched_object_name)
+        store_query_cache(image_hash, q, result)
+        return result
             
+    except UnidentifiedImageError as e:
+        raise HTTPException(status_code=400, detail=f"이미지 형식을 인식할 수 없습니다: {e}")
     except Exception as e:
         print(f"💥 이미지 인식 오류: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/recognize-stamp-object")
+async def recognize_stamp_object(payload: dict = Body(...)):
+    if INITIALIZATION_ERROR: raise HTTPException(status_code=500, detail=f"{INITIALIZATION_ERROR}")
+
+    user_image_b64 = payload.get("image")
+    if not user_image_b64: raise HTTPException(status_code=400, detail="이미지 데이터가 없습니다.")
+    if not isinstance(user_image_b64, str): raise HTTPException(status_code=400, detail="이미지 데이터는 문자열(base64)이어야 합니다.")
+
+    # ✨ split(',')은 리스트와 문자열 사본을 만들므로 rpartition으로 data URL 접두어만 떼어냅니다.
+    #    (접두어가 없으면 문자열 전체를 base64로 취급)
+    _, _, user_image_b64 = user_image_b64.rpartition(',')
+    try:
+        user_image_bytes = base64.b64decode(user_image_b64, validate=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"이미지 데이터를 해석할 수 없습니다: {e}")
+    # 임베딩 호출은 동기 API라 이벤트 루프를 막지 않도록 별도 스레드에서 실행합니다.
+    return await asyncio.to_thread(recognize_image_bytes, user_image_bytes)
+
+# ✨ base64 없이 multipart로 원본 바이너리를 보내면 전송량(~33%)과 디코딩 한 번을 아낄 수 있습니다.
+@app.post("/api/recognize-stamp-object-file")
+async def recognize_stamp_object_file(image: UploadFile = File(...)):
+    if INITIALIZATION_ERROR: raise HTTPException(status_code=500, detail=f"{INITIALIZATION_ERROR}")
+
+    user_image_bytes = await image.read()
+    if not user_image_bytes: raise HTTPException(status_code=400, detail="이미지 데이터가 없습니다.")
+    return await asyncio.to_thread(recognize_image_bytes, user_image_bytes)
\ No newline at end of file